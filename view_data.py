@@ -47,4 +47,9 @@ def view_id(view):
     Returns views ID.
     """
 
+    # ST3 keeps ID in the view object itself, so no API call (and no wait
+    # for the main thread) is needed
+    if hasattr(view, "view_id"):
+        return view.view_id
+
     return utils.execute_in_sublime_main_thread(lambda: view.id())
@@ -3,6 +3,8 @@ This module provides functions for extracting YAML symbols.
 """
 
 import sublime
+from array import array
+from bisect import bisect_left, bisect_right
 
 try:
     from . import utils
@@ -10,38 +12,262 @@ except:
     # ST2
     import utils
 
+try:
+    from sys import intern
+except ImportError:
+    # ST2: Python 2 can't intern unicode strings
+    def intern(string):
+        return string
+
+
+# Selector of YAML keys in YAML-ng syntax
+YAML_KEY_SELECTOR = "entity.name.tag.yaml"
+
+# Number of keys processed between checks for buffer modification while extracting symbols
+KEYS_CHUNK_SIZE = 512
+
+
+class YamlSymbols:
+    """
+    List of YAML symbols stored as parallel arrays (in document order):
+    keys with their indentation levels and parent key indices, and
+    beginnings/ends of key regions. Symbol names (dotted key paths) are
+    built on demand from keys and parents.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.indents = array("i")
+        self.parents = array("i")
+        self.begins = array("i")
+        self.ends = array("i")
+
+        # Names of all symbols, built on first request
+        self.names = None
+
+    def __len__(self):
+        return len(self.keys)
+
+    def append(self, key, indent_level, begin, end):
+        """
+        Adds key with given indentation level and region bounds to the end of the list.
+        Parent index is assigned later by get_yaml_symbols.
+        """
+
+        self.names = None
+        self.keys.append(intern(key))
+        self.indents.append(indent_level)
+        self.begins.append(begin)
+        self.ends.append(end)
+
+    def head(self, count):
+        """
+        Returns new list with first count symbols.
+        """
+
+        symbols = YamlSymbols()
+        symbols.keys = self.keys[:count]
+        symbols.indents = self.indents[:count]
+        symbols.parents = self.parents[:count]
+        symbols.begins = self.begins[:count]
+        symbols.ends = self.ends[:count]
+
+        return symbols
+
+    def name(self, index):
+        """
+        Returns name of symbol with given index.
+        """
+
+        if self.names is not None:
+            return self.names[index]
+
+        path = []
+
+        while index >= 0:
+            path.append(self.keys[index])
+            index = self.parents[index]
+
+        path.reverse()
+
+        return ".".join(path)
+
+    def get_names(self):
+        """
+        Returns list with names of all symbols.
+        """
+
+        if self.names is None:
+            names = []
+
+            for key, parent in zip(self.keys, self.parents):
+                names.append(key if parent < 0 else names[parent] + "." + key)
+
+            self.names = names
+
+        return self.names
+
+    def region(self, index):
+        """
+        Returns key region of symbol with given index.
+        """
+
+        return sublime.Region(self.begins[index], self.ends[index])
+
+    def get(self, index):
+        """
+        Returns symbol with given index as dict with name and region.
+        """
+
+        return {"name": self.name(index), "region": self.region(index)}
+
+    def index(self, begin):
+        """
+        Returns index of the symbol which key starts at given position or -1.
+        """
+
+        index = bisect_left(self.begins, begin)
+
+        if index < len(self) and self.begins[index] == begin:
+            return index
+
+        return -1
+
+    def find(self, begin, end):
+        """
+        Returns index of the last symbol which key intersects given range or -1.
+        """
+
+        # Last key starting before the range end
+        index = bisect_right(self.begins, end) - 1
+
+        if index >= 0 and self.ends[index] >= begin:
+            return index
+
+        return -1
+
 
-def get_yaml_symbols(view):
+def get_yaml_symbols(view, trim_leading_colon=False, cache=None, change_count=None):
     """
     Returns YAML key paths and associated regions for given sublime view.
     Paths calculated by key indentation level -- it's more efficient and secure, but doesn't support inline hashes.
+
+    Returns tuple (symbols, cache). Pass the cache to the next call to reuse
+    symbols located before the first modified line instead of rebuilding them.
+    When change_count is given and the buffer gets modified during extraction,
+    it's cancelled and None is returned instead of symbols.
     """
 
     # Get regions with YAML tags
-    regions = get_view_regions(view, "entity.name.tag.yaml")
+    regions = get_view_regions(view, YAML_KEY_SELECTOR)
 
     # Read the entire buffer content into the memory: it's much much faster than multiple substr's
     content = get_view_content(view)
 
-    symbols = []
-    current_path = []
+    symbols = YamlSymbols()
+    reused = 0
+
+    if cache and cache["trim_leading_colon"] == trim_leading_colon:
+        # Keys located before the first modified line have the same text, indentation and paths
+        modified_at = content.rfind("\n", 0, get_common_prefix_length(cache["content"], content)) + 1
+        cached_symbols = cache["symbols"]
+        reused = min(bisect_left(cached_symbols.ends, modified_at), len(regions))
+
+        # Sanity check: selector must have found the same keys in the unmodified part
+        while reused > 0 and (cached_symbols.begins[reused - 1] != regions[reused - 1].begin() or
+                              cached_symbols.ends[reused - 1] != regions[reused - 1].end()):
+            reused -= 1
+
+        symbols = cached_symbols.head(reused)
+
+    for index in range(reused, len(regions)):
+        # Stop early when user keeps typing
+        if change_count is not None and (index - reused) % KEYS_CHUNK_SIZE == 0 and \
+                get_view_change_count(view) != change_count:
+            return None, cache
 
-    for region in regions:
+        region = regions[index]
         key = content[region.begin():region.end()]
 
         # Characters count from line beginning to key start position
+        # (rfind scans backwards from the key, so it only walks the current line)
         indent_level = region.begin() - content.rfind("\n", 0, region.begin()) - 1
 
-        # Pop items from current_path while its indentation level less than current key indentation
-        while len(current_path) > 0 and current_path[-1]["indent"] >= indent_level:
-            current_path.pop()
+        # Remove leading colons when setting trim_leading_colon = true
+        # (most keys have no colons at all, so skip them)
+        if trim_leading_colon and ":" in key:
+            key = trim_leading_colons(key)
+
+        symbols.append(key, indent_level, region.begin(), region.end())
+
+    assign_parents(symbols.indents, symbols.parents)
+
+    cache = {
+        "content": content,
+        "symbols": symbols,
+        "trim_leading_colon": trim_leading_colon
+    }
+
+    return symbols, cache
+
+
+def get_common_prefix_length(a, b):
+    """
+    Returns length of the common prefix of two given strings.
+    Uses binary search over slice comparisons, so the actual comparing is done in C.
+    """
+
+    low, high = 0, min(len(a), len(b))
+
+    while low < high:
+        middle = (low + high + 1) // 2
+
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+
+    return low
+
+
+def trim_leading_colons(key):
+    """
+    Removes leading colon from given key and from each of its dot separated parts.
+    e.g. :foo.:bar --> foo.bar
+    """
+
+    if key.startswith(":"):
+        key = key[1:]
+
+    return key.replace(".:", ".")
+
+
+def assign_parents(indents, parents):
+    """
+    Appends to parents array index of parent key (or -1 for top level keys)
+    for every indentation level from indents which has no parent yet.
+    Parent is the nearest preceding key with lower indentation level.
+    """
+
+    # Restore stack of enclosing keys from ancestors of the last assigned key
+    stack = []
+    index = len(parents) - 1
+
+    while index >= 0:
+        stack.append(index)
+        index = parents[index]
+
+    stack.reverse()
 
-        current_path.append({"key": key, "indent": indent_level})
+    for index in range(len(parents), len(indents)):
+        indent_level = indents[index]
 
-        symbol_name = ".".join(map(lambda item: item["key"], current_path))
-        symbols.append({"name": symbol_name, "region": region})
+        # Pop keys from the stack while their indentation level isn't less than current key indentation
+        while len(stack) > 0 and indents[stack[-1]] >= indent_level:
+            stack.pop()
 
-    return symbols
+        parents.append(stack[-1] if len(stack) > 0 else -1)
+        stack.append(index)
 
 
 def get_selected_yaml_symbol(symbols, view):
@@ -53,21 +279,18 @@ def get_selected_yaml_symbol(symbols, view):
     if not symbols:
         return None
 
-    selection = get_view_selected_lines(view)
+    selected_line = get_view_selected_line(view)
 
-    # 1 cursor
-    if len(selection) == 1:
-        # Reversing list because we are searching for the deepest key
-        yaml_symbols = reversed(symbols)
+    # 1 cursor on 1 line
+    if selected_line is not None:
+        # Search for the deepest key on the selected line
+        index = symbols.find(*selected_line)
 
-        # Search for 1 intersection
-        for selected_region in selection:
-            for symbol in yaml_symbols:
-                if selected_region.intersects(symbol["region"]):
-                    return symbol
+        if index >= 0:
+            return symbols.get(index)
 
     else:
-        # Ambigous symbol: multiple cursors
+        # Ambigous symbol: multiple cursors or lines
         return None
 
 
@@ -75,7 +298,7 @@ def get_view_regions(view, selector):
     """
     Returns regions for given selector in given view.
     """
-    return utils.execute_in_sublime_main_thread(lambda: view.find_by_selector( selector ))
+    return utils.execute_in_sublime_main_thread(lambda: view.find_by_selector(selector))
 
 
 def get_view_content(view):
@@ -85,8 +308,35 @@ def get_view_content(view):
     return utils.execute_in_sublime_main_thread(lambda: view.substr(sublime.Region(0, view.size())))
 
 
-def get_view_selected_lines(view):
+def get_view_change_count(view):
     """
-    Returns selected lines as regions in given view.
+    Returns change count of given view.
     """
-    return utils.execute_in_sublime_main_thread(lambda: [line for sel in view.sel() for line in view.lines(sel)])
+    return utils.execute_in_sublime_main_thread(lambda: view.change_count())
+
+
+def get_view_selected_line(view):
+    """
+    Returns (begin, end) of selected line in given view or None if selection
+    has multiple cursors or spans multiple lines.
+    """
+
+    def get_line():
+        selection = view.sel()
+
+        if len(selection) != 1:
+            return None
+
+        selected_region = selection[0]
+
+        # Cursor without selection is always on 1 line, skip rows comparison
+        if selected_region.empty():
+            line = view.line(selected_region.b)
+        elif view.rowcol(selected_region.begin())[0] == view.rowcol(selected_region.end())[0]:
+            line = view.line(selected_region)
+        else:
+            return None
+
+        return (line.begin(), line.end())
+
+    return utils.execute_in_sublime_main_thread(get_line)
@@ -26,6 +26,18 @@ SETTINGS_FILE = "YAML Nav.sublime-settings"
 # Delay in seconds after which symbols will be updated on buffer modification
 UPDATE_SYMBOLS_DELAY = 0.4
 
+# Delay in seconds to coalesce current symbol updates on cursor movement
+UPDATE_CURRENT_SYMBOL_DELAY = 0.03
+
+# Regexp to trim first tag from symbols of localization files
+TRIM_LANGUAGE_TAG_RE = re.compile(r"^(.+?)\.")
+
+# Dictionary: regexp setting value => compiled regexp
+__setting_regexps = {}
+
+# Dictionary: ID of view known to contain YAML code => its syntax
+__yaml_view_syntaxes = {}
+
 
 def set_status(view, message):
     """
@@ -43,9 +55,30 @@ def set_status(view, message):
 def is_yaml_view(view):
     """
     Returns true if given view contains YAML code.
+    Positive result is cached until view syntax changes or the view is closed.
     """
 
-    return view.score_selector(0, "source.yaml") > 0
+    cached_syntax = __yaml_view_syntaxes.get(view.id())
+
+    if cached_syntax is not None:
+        if cached_syntax == view.settings().get("syntax"):
+            return True
+
+        del __yaml_view_syntaxes[view.id()]
+
+    if view.score_selector(0, "source.yaml") > 0:
+        __yaml_view_syntaxes[view.id()] = view.settings().get("syntax")
+        return True
+
+    return False
+
+
+def forget_yaml_view(view):
+    """
+    Drops cached is_yaml_view result for given view.
+    """
+
+    __yaml_view_syntaxes.pop(view.id(), None)
 
 
 def get_setting(key):
@@ -56,16 +89,30 @@ def get_setting(key):
     return sublime.load_settings(SETTINGS_FILE).get(key)
 
 
+def get_setting_re(key):
+    """
+    Returns compiled case insensitive regexp from setting with given key.
+    Regexps are compiled once per setting value.
+    """
+
+    pattern = get_setting(key)
+
+    if pattern not in __setting_regexps:
+        __setting_regexps[pattern] = re.compile(pattern, re.I)
+
+    return __setting_regexps[pattern]
+
+
 class YamlNavListener(sublime_plugin.EventListener):
     """
     Listens for file modification/cursor movement and updates list of
     YAML symbols and currently selected symbol.
     """
 
-    # Regexp to remove leading colon in symbol paths
-    REMOVE_COLON_RE = re.compile(r"((?<=(^)):|((?<=(\.)):))")
-
     def on_load(self, view):
+        # Syntax may be different after reload
+        forget_yaml_view(view)
+
         if is_yaml_view(view):
             # Force our custom syntax
             view.set_syntax_file("Packages/YAML Nav/YAML-ng.sublime-syntax")
@@ -96,11 +143,12 @@ class YamlNavListener(sublime_plugin.EventListener):
     def on_selection_modified(self, view):
         if is_yaml_view(view):
             # Update current symbol after cursor movement
-            self.update_current_yaml_symbol(view)
+            self.schedule_current_yaml_symbol_update(view)
 
     def on_close(self, view):
         # Clear list after view close
         self.clear_yaml_symbols(view)
+        forget_yaml_view(view)
 
     def update_yaml_symbols(self, view):
         """
@@ -112,16 +160,25 @@ class YamlNavListener(sublime_plugin.EventListener):
             Do actual symbols update in separate thread.
             """
 
-            # Extract symbols
-            symbols = yaml_math.get_yaml_symbols(view)
+            change_count = yaml_math.get_view_change_count(view)
+
+            # Skip update if buffer wasn't modified since the last one
+            if view_data.get(view, "yaml_symbols") is not None and \
+                    view_data.get(view, "yaml_symbols_change_count") == change_count:
+                return
 
-            # Remove leading colons when setting trim_leading_colon = true
-            if get_setting("trim_leading_colon"):
-                for symbol in symbols:
-                    symbol["name"] = self.REMOVE_COLON_RE.sub("", symbol["name"])
+            # Extract symbols reusing the ones which weren't affected by the modification
+            symbols, cache = yaml_math.get_yaml_symbols(
+                view, get_setting("trim_leading_colon"), view_data.get(view, "yaml_symbols_cache"), change_count)
+
+            # Buffer was modified during extraction: next scheduled update will handle it
+            if symbols is None:
+                return
 
             # Save symbols
             view_data.set(view, "yaml_symbols", symbols)
+            view_data.set(view, "yaml_symbols_cache", cache)
+            view_data.set(view, "yaml_symbols_change_count", change_count)
 
             # Also update current symbol because it may have changed
             self.update_current_yaml_symbol(view)
@@ -147,6 +204,41 @@ class YamlNavListener(sublime_plugin.EventListener):
             view_data.set(view, "symbols_update_scheduled", True)
             sublime.set_timeout(schedule_update, int(UPDATE_SYMBOLS_DELAY * 1000))
 
+    def schedule_current_yaml_symbol_update(self, view):
+        """
+        Schedules current YAML symbol update after cursor movement. Multiple cursor
+        movements within UPDATE_CURRENT_SYMBOL_DELAY are handled by a single update.
+        """
+
+        def do_update():
+            """
+            Updates current symbol unless selected lines and buffer are the same.
+            """
+
+            # View was closed while update was scheduled
+            if view.buffer_id() == 0:
+                return
+
+            view_data.set(view, "current_symbol_update_scheduled", False)
+
+            selection = view.sel()
+
+            if len(selection) == 1:
+                selected_rows = (view.rowcol(selection[0].a)[0], view.rowcol(selection[0].b)[0])
+            else:
+                selected_rows = len(selection)
+
+            caret = (view.change_count(), selected_rows)
+
+            if caret != view_data.get(view, "current_symbol_caret"):
+                view_data.set(view, "current_symbol_caret", caret)
+                self.update_current_yaml_symbol(view)
+
+        # Schedule update unless it already scheduled
+        if not view_data.get(view, "current_symbol_update_scheduled"):
+            view_data.set(view, "current_symbol_update_scheduled", True)
+            sublime.set_timeout(do_update, int(UPDATE_CURRENT_SYMBOL_DELAY * 1000))
+
     def update_current_yaml_symbol(self, view):
         """
         Calculates current selected YAML symbol and saves it in the view data.
@@ -172,37 +264,66 @@ class YamlNavListener(sublime_plugin.EventListener):
 
 class GotoYamlSymbolCommand(sublime_plugin.TextCommand):
     """
-    Opens quick panel with YAML symbols.
+    Opens quick panel with YAML symbols. When run from the command palette
+    in ST3 build 3154+ symbols are listed by the palette itself.
     """
 
-    def run(self, edit):
-        symbols = view_data.get(self.view, "yaml_symbols") or []
+    def run(self, edit, symbol=None):
+        symbols = view_data.get(self.view, "yaml_symbols") or yaml_math.YamlSymbols()
+
+        if symbol is None:
+            def on_symbol_selected(index):
+                if index >= 0:
+                    self.goto_region(symbols.region(index))
 
-        def on_symbol_selected(index):
-            if index >= 0:
-                region = symbols[index]["region"]
+            self.view.window().show_quick_panel(symbols.get_names(), on_symbol_selected)
+        else:
+            # Symbols may be rebuilt while the palette is shown, so find the listed key again
+            index = symbols.index(symbol["begin"])
+
+            if index >= 0 and symbols.name(index) == symbol["name"]:
+                self.goto_region(symbols.region(index))
 
-                self.view.show_at_center(region)
+    def input(self, args):
+        if "symbol" not in args and hasattr(sublime_plugin, "ListInputHandler"):
+            return YamlSymbolInputHandler(view_data.get(self.view, "yaml_symbols") or yaml_math.YamlSymbols())
 
-                # Set cursor after YAML key
-                self.view.sel().clear()
-                self.view.sel().add(sublime.Region(region.end() + 1))
+    def goto_region(self, region):
+        """
+        Shows given YAML key region and sets cursor after it.
+        """
 
-        self.view.window().show_quick_panel(
-            list(map(lambda x: x["name"], symbols)), on_symbol_selected)
+        self.view.show_at_center(region)
+
+        # Set cursor after YAML key
+        self.view.sel().clear()
+        self.view.sel().add(sublime.Region(region.end() + 1))
 
     def is_enabled(self):
         return is_yaml_view(self.view)
 
 
-class CopyYamlSymbolToClipboardCommand(sublime_plugin.TextCommand):
-    def __init__(self, *args):
-        sublime_plugin.TextCommand.__init__(self, *args)
+if hasattr(sublime_plugin, "ListInputHandler"):
+    class YamlSymbolInputHandler(sublime_plugin.ListInputHandler):
+        """
+        Lists YAML symbols in the command palette for goto_yaml_symbol command.
+        """
+
+        def __init__(self, symbols):
+            self.symbols = symbols
+
+        def name(self):
+            return "symbol"
+
+        def placeholder(self):
+            return "YAML symbol"
 
-        # Load settings
-        self.detect_locale_filename_re = re.compile(get_setting("detect_locale_filename_re"), re.I)
-        self.trim_language_tag_on_copy_from_locales = get_setting("trim_language_tag_on_copy_from_locales")
+        def list_items(self):
+            return [(name, {"name": name, "begin": begin})
+                    for name, begin in zip(self.symbols.get_names(), self.symbols.begins)]
 
+
+class CopyYamlSymbolToClipboardCommand(sublime_plugin.TextCommand):
     def run(self, edit):
         """
         Copies selected YAML symbol into clipboard.
@@ -215,14 +336,17 @@ class CopyYamlSymbolToClipboardCommand(sublime_plugin.TextCommand):
 
             # Automatically detect localization YAML and trim first tag
             # (if enabled in settings)
-            if self.trim_language_tag_on_copy_from_locales and self.is_locale_file():
-                current_symbol_name = re.sub("^(.+?)\\.", "", current_symbol_name)
+            if get_setting("trim_language_tag_on_copy_from_locales") and self.is_locale_file():
+                current_symbol_name = TRIM_LANGUAGE_TAG_RE.sub("", current_symbol_name)
 
             sublime.set_clipboard(current_symbol_name)
             set_status(self.view, "%s - copied to clipboard!" % current_symbol_name)
         else:
             set_status(self.view, "nothing selected - can't copy!")
 
+        # Restore current symbol in the status bar on next cursor movement
+        view_data.set(self.view, "current_symbol_caret", None)
+
     def is_enabled(self):
         return is_yaml_view(self.view)
 
@@ -231,4 +355,4 @@ class CopyYamlSymbolToClipboardCommand(sublime_plugin.TextCommand):
         Returns true if current file is localization file.
         """
 
-        return self.detect_locale_filename_re.search(self.view.file_name()) is not None
+        return get_setting_re("detect_locale_filename_re").search(self.view.file_name()) is not None